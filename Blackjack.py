@@ -1,100 +1,293 @@
-import random
+import os
+import sys
 import numpy as np
 import time
 import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+from numba import njit
 
-class Card:
-    def __init__(self, suit, value):
-        self.suit = suit
-        self.value = value
+# One suit's worth of card values: 2-10 for pips and faces, 11 for an Ace.
+CARD_VALUES = np.array([2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11], dtype=np.int8)
 
-    def __repr__(self):
-        return f"{self.value} of {self.suit}"
+def _card_label(card):
+    # How a card value is shown to the player; Aces are stored as 11.
+    return "A" if card == 11 else str(card)
+
+def _hand_label(hand):
+    return "[" + ", ".join(_card_label(card) for card in hand) + "]"
+# Enough room for the longest possible hand from any deck: every card adds at least 1 to the
+# total with Aces counted as 1, so no hand takes a card once that total passes 21.
+MAX_CARDS = 22
+# Dense Q-table shape: (player_total, dealer_rank, has_ace, action).
+Q_SHAPE = (32, 11, 2, 2)
+
+@njit(cache=True, nogil=True)
+def _hand_value(ranks):
+    # Returns the best total and whether an Ace is still counted as 11.
+    hard = 0
+    aces = 0
+    for r in ranks:
+        hard += r
+        aces += (r == 11)
+    hard -= 10 * aces
+    # With every Ace counted as 1, one of them can still count as 11 if that doesn't bust the hand.
+    if aces and hard <= 11:
+        return hard + 10, 1
+    return hard, 0
+
+@njit(cache=True, nogil=True)
+def _score(ranks):
+    return _hand_value(ranks)[0]
+
+# Compile once at import so the first round doesn't pay the JIT latency.
+_score(np.array([2, 11], dtype=np.int8))
+
+def _add_card(total, aces, card):
+    # Adds a card to a running (total, usable Aces) pair, demoting an Ace if the hand would bust.
+    total += card
+    aces += card == 11
+    while total > 21 and aces:
+        total -= 10
+        aces -= 1
+    return total, aces
+
+@njit(cache=True, nogil=True)
+def _state_index(hand, upcard):
+    # Maps a hand and the dealer's visible card onto Q-table indices. An Ace upcard is rank 1.
+    player_total, aces = _hand_value(hand)
+    dealer_rank = 1 if upcard == 11 else upcard
+    return player_total, dealer_rank, 1 if aces > 0 else 0
+
+# The dealer's possible final totals; 22 stands in for any bust.
+DEALER_OUTCOMES = np.array([17, 18, 19, 20, 21, 22])
+
+def _dealer_distribution():
+    # Probability of each dealer outcome from every (total, usable Ace) starting point, drawing
+    # from an infinite deck and standing on 17 or more. Drawing always raises the hard total
+    # (Aces counted as 1), so states are filled from the highest hard total down.
+    dist = np.zeros((22, 2, len(DEALER_OUTCOMES)))
+    for hard in range(21, 1, -1):
+        for aces in (0, 1):
+            total = hard + 10 * aces
+            if total > 21:
+                continue
+            if total >= 17:
+                dist[total, aces, total - 17] = 1.0
+                continue
+            for card in CARD_VALUES:
+                next_total, next_aces = _add_card(total, aces, int(card))
+                if next_total > 21:
+                    dist[total, aces, -1] += 1 / len(CARD_VALUES)
+                else:
+                    dist[total, aces] += dist[next_total, next_aces] / len(CARD_VALUES)
+    return dist
+
+# Cumulative form of the dealer outcome table, indexed by the dealer's (total, usable Ace).
+DEALER_CDF = np.cumsum(_dealer_distribution(), axis=2)
+DEALER_CDF[:, :, -1] = 1.0
+
+@njit(cache=True, nogil=True)
+def _play_round(player, dealer, q_table_arr, alpha, gamma, epsilon):
+    # Plays one AI-vs-dealer round in the given hand buffers, updates the Q-table and returns the reward.
+    # The learning rule matches the interactive game: one update per round from the opening state
+    # using the last action taken.
+    for j in range(2):
+        player[j] = CARD_VALUES[np.random.randint(13)]
+        dealer[j] = CARD_VALUES[np.random.randint(13)]
+    n_player = 2
+    n_dealer = 2
+    pt0, dr, ha0 = _state_index(player[:n_player], dealer[0])
+
+    action = 1
+    while True:
+        pt, dr, ha = _state_index(player[:n_player], dealer[0])
+        if np.random.random() < epsilon:
+            action = np.random.randint(2)
+        else:
+            action = 0 if q_table_arr[pt, dr, ha, 0] >= q_table_arr[pt, dr, ha, 1] else 1
+        if action == 1:
+            break
+        player[n_player] = CARD_VALUES[np.random.randint(13)]
+        n_player += 1
+        if _score(player[:n_player]) > 21:
+            break
+
+    player_score = _score(player[:n_player])
+    if action == 1:
+        while _score(dealer[:n_dealer]) < 17:
+            dealer[n_dealer] = CARD_VALUES[np.random.randint(13)]
+            n_dealer += 1
+    dealer_score = _score(dealer[:n_dealer])
+
+    if player_score > 21:
+        reward = -10
+    elif dealer_score > 21 or player_score > dealer_score:
+        reward = 2
+    elif player_score < dealer_score:
+        reward = -1
+    else:
+        reward = 0
+
+    pt1, dr, ha1 = _state_index(player[:n_player], dealer[0])
+    future_q = max(q_table_arr[pt1, dr, ha1, 0], q_table_arr[pt1, dr, ha1, 1])
+    current_q = q_table_arr[pt0, dr, ha0, action]
+    q_table_arr[pt0, dr, ha0, action] = current_q + alpha * (reward + gamma * future_q - current_q)
+    return reward
+
+@njit(cache=True, nogil=True)
+def play_rounds(n_rounds, q_table_arr, alpha, gamma, epsilon_arr, seed):
+    # Plays n_rounds back to back without holding the GIL and returns each round's reward.
+    # Seeds this thread's Numba RNG first so a run can be replayed.
+    np.random.seed(seed)
+    rewards = np.zeros(n_rounds, dtype=np.int32)
+    player = np.zeros(MAX_CARDS, dtype=np.int8)
+    dealer = np.zeros(MAX_CARDS, dtype=np.int8)
+    for i in range(n_rounds):
+        rewards[i] = _play_round(player, dealer, q_table_arr, alpha, gamma, epsilon_arr[i])
+    return rewards
+
+def simulate_batch(n_rounds, q_table_arr, alpha, gamma, epsilon_arr, rng=None, workers=None):
+    # Deals rounds out to worker threads running play_rounds and returns the rewards in round order.
+    # Worker w plays rounds w, w + workers, ... so every worker follows the whole epsilon schedule.
+    # Cards are drawn from an infinite deck since workers can't share one shoe. Each worker learns
+    # into its own copy of the Q-table, and the copies are averaged back into q_table_arr at the end.
+    # A seeded rng replays the same run for the same number of workers (os.cpu_count() by default).
+    workers = min(workers or os.cpu_count() or 1, n_rounds)
+    epsilon_arr = epsilon_arr[:n_rounds]
+    # Numba seeds its generator with a 32-bit value.
+    seeds = (np.random.default_rng() if rng is None else rng).integers(2**32, size=workers)
+    rewards = np.empty(n_rounds, dtype=np.int32)
+    worker_q = [q_table_arr.copy() for _ in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_rounds, len(epsilon_arr[w::workers]), worker_q[w], alpha, gamma,
+                                   epsilon_arr[w::workers], seeds[w]) for w in range(workers)]
+        for w, future in enumerate(futures):
+            rewards[w::workers] = future.result()
+    q_table_arr[:] = np.mean(worker_q, axis=0)
+    return rewards
 
 class Deck:
-    def __init__(self):
-        suits = ["Hearts", "Diamonds", "Clubs", "Spades"]
-        values = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "Jack", "Queen", "King", "Ace"]
-        self.cards = [Card(suit, value) for suit in suits for value in values]
-        self.shuffle()
+    def __init__(self, shoes=100, rng=None):
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.refill_many(shoes)
 
-    def shuffle(self):
-        random.shuffle(self.cards)
+    def refill_many(self, k):
+        # Shuffles k full decks in one vectorized call; deal() then works through them row by row.
+        self.pool = self.rng.permuted(np.tile(CARD_VALUES, (k, 4)), axis=1)
+        self.shoe_idx = 0
+        self.card_idx = 0
 
     def deal(self):
-        if len(self.cards) == 0:
-            self.__init__()
-        return self.cards.pop()
+        if self.card_idx == self.pool.shape[1]:
+            self.shoe_idx += 1
+            self.card_idx = 0
+            if self.shoe_idx == len(self.pool):
+                self.refill_many(len(self.pool))
+        card = int(self.pool[self.shoe_idx, self.card_idx])
+        self.card_idx += 1
+        return card
 
 class Blackjack:
-    def __init__(self, alpha=0.5, gamma=0.9, epsilon=1.0):
-        self.deck = Deck()
-        self.player_hand = []
-        self.dealer_hand = []
+    def __init__(self, alpha=0.5, gamma=0.9, epsilon=1.0, verbose=True, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.deck = Deck(rng=self.rng)
+        self._uniforms = []
+        self._uniform_idx = 0
+        self.player_hand_arr = np.zeros(MAX_CARDS, dtype=np.int8)
+        self.dealer_hand_arr = np.zeros(MAX_CARDS, dtype=np.int8)
+        self.n_player = 0
+        self.n_dealer = 0
+        self.p_total = self.p_aces = 0
+        self.d_total = self.d_aces = 0
+        # Q-table index of the current hand, and of the hand as it was dealt.
+        self._state = self._start_state = (0, 0, 0)
         self.game_over = False
         self.alpha = alpha
         self.gamma = gamma
         self.epsilon = epsilon
-        self.q_table = {}
+        self.verbose = verbose
+        self.Q = np.zeros(Q_SHAPE, dtype=np.float32)
+
+    @property
+    def player_hand(self):
+        return self.player_hand_arr[:self.n_player].tolist()
+
+    @property
+    def dealer_hand(self):
+        return self.dealer_hand_arr[:self.n_dealer].tolist()
 
     def compute_state(self):
-        player_total = self.score_hand(self.player_hand)
-        dealer_visible_card = self.dealer_hand[0].value if self.dealer_hand else None
-        has_ace = any(card.value == 'Ace' for card in self.player_hand if self.score_hand([card]) == 11)
-        return (player_total, dealer_visible_card, has_ace)
+        return self._state
 
     def update_q_value(self, state, action, reward, next_state):
-        current_q = self.q_table.get(state, [0, 0])[action]
-        max_future_q = max(self.q_table.get(next_state, [0, 0]))
-        new_q = current_q + self.alpha * (reward + self.gamma * max_future_q - current_q)
-        self.q_table[state][action] = new_q
+        current_q = self.Q[state][action]
+        self.Q[state][action] = current_q + self.alpha * (reward + self.gamma * self.Q[next_state].max() - current_q)
+
+    def transition(self, action, reward):
+        # Updates the Q-value of the dealt hand for the round's last action, looking ahead to the final hand.
+        self.update_q_value(self._start_state, action, reward, self._state)
 
     def ai_decision(self):
-        state = self.compute_state()
-        if state not in self.q_table:
-            self.q_table[state] = [0, 0]
-        if random.random() < self.epsilon:
-            action = random.choice([0, 1])
+        state = self._state
+        q = self.Q[state]
+        if self._uniform() < self.epsilon:
+            action = 1 if self._uniform() < 0.5 else 0
         else:
-            action = np.argmax(self.q_table[state])
-        self.epsilon *= 0.995
-        print(f"\nAI's current state: {state}, Q-values: {self.q_table[state]}, Action taken: {'Hit' if action == 0 else 'Stand'}, Epsilon: {self.epsilon}")
+            action = 0 if q[0] >= q[1] else 1
+        if self.verbose:
+            print(f"\nAI's current state: {state}, Q-values: {q}, Action taken: {'Hit' if action == 0 else 'Stand'}, Epsilon: {self.epsilon}")
         return action
 
+    def _uniform(self):
+        # Single draws from a Generator are slow, so uniforms are drawn in blocks and handed out one at a time.
+        if self._uniform_idx == len(self._uniforms):
+            self._uniforms = self.rng.random(4096).tolist()
+            self._uniform_idx = 0
+        u = self._uniforms[self._uniform_idx]
+        self._uniform_idx += 1
+        return u
+
     def deal_initial_cards(self):
-        self.player_hand = [self.deck.deal(), self.deck.deal()]
-        self.dealer_hand = [self.deck.deal(), self.deck.deal()]
+        self.player_hand_arr[0] = self.deck.deal()
+        self.player_hand_arr[1] = self.deck.deal()
+        self.dealer_hand_arr[0] = self.deck.deal()
+        self.dealer_hand_arr[1] = self.deck.deal()
+        self.n_player = 2
+        self.n_dealer = 2
+        self.p_total, self.p_aces = _hand_value(self.player_hand_arr[:2])
+        self.d_total, self.d_aces = _hand_value(self.dealer_hand_arr[:2])
+        upcard = int(self.dealer_hand_arr[0])
+        self._state = (self.p_total, 1 if upcard == 11 else upcard, 1 if self.p_aces else 0)
+        self._start_state = self._state
 
     def score_hand(self, hand):
-        score = 0
-        ace_count = 0
-        for card in hand:
-            if card.value in ["Jack", "Queen", "King"]:
-                score += 10
-            elif card.value == "Ace":
-                ace_count += 1
-                score += 11
-            else:
-                score += int(card.value)
-        while score > 21 and ace_count:
-            score -= 10
-            ace_count -= 1
-        return score
+        return int(_score(np.asarray(hand, dtype=np.int8)))
 
     def player_hit(self):
-        self.player_hand.append(self.deck.deal())
-        if self.score_hand(self.player_hand) > 21:
+        card = self.deck.deal()
+        self.player_hand_arr[self.n_player] = card
+        self.n_player += 1
+        self.p_total, self.p_aces = _add_card(self.p_total, self.p_aces, card)
+        self._state = (self.p_total, self._state[1], 1 if self.p_aces else 0)
+        if self.p_total > 21:
             self.game_over = True
 
     def dealer_turn(self):
-        while self.score_hand(self.dealer_hand) < 17:
-            self.dealer_hand.append(self.deck.deal())
+        # Sample where the dealer ends up rather than drawing card by card.
+        outcome = np.searchsorted(DEALER_CDF[self.d_total, self.d_aces], self._uniform(), side='right')
+        self.d_total = int(DEALER_OUTCOMES[outcome])
         self.game_over = True
 
     def get_winner(self):
-        player_score = self.score_hand(self.player_hand)
-        dealer_score = self.score_hand(self.dealer_hand)
-        print(f"Dealer's final hand: {self.dealer_hand} with a total of {dealer_score}")
+        player_score = self.p_total
+        dealer_score = self.d_total
+        if self.verbose:
+            if player_score > 21:
+                print(f"Dealer's hand: {_hand_label(self.dealer_hand)} with a total of {dealer_score}")
+            else:
+                # The dealer's draws aren't dealt, only where they end up, so say the total was sampled.
+                finish = "busts" if dealer_score > 21 else f"finishes on {dealer_score}"
+                print(f"Dealer shows {_hand_label(self.dealer_hand)} and {finish} (sampled)")
         if player_score > 21:
             return -10, "Player busts! Dealer wins."  # Increased penalty for busting
         elif dealer_score > 21 or player_score > dealer_score:
@@ -104,8 +297,8 @@ class Blackjack:
         else:
             return 0, "It's a tie."  # Neutral outcome
 
-def main():
-    game = Blackjack()
+def main(seed=None):
+    game = Blackjack(seed=seed)
     auto_play = False
     rounds_to_play = 0
     round_count = 0
@@ -135,12 +328,13 @@ def main():
     print("- Statistically speaking, we always expect to see a low total win percentage after the first")
     print("  50 or so games, gradually increasing and averaging out to a cap of about 40.5% as the")
     print("  number of games played goes to the tens of thousands. The house always wins in the long run.")
-    print("\n\n'y' to play a hand, 'n' to stop, 'auto' to auto-play several hands quickly (recommended), or 'plot' to plot a graph.")
+    print("\n\n'y' to play a hand, 'n' to stop, 'auto' to auto-play several hands quickly (recommended),")
+    print("'train' to silently train on many hands at once, or 'plot' to plot a graph.")
     print("****************************************************\n")
 
     while True:
         if not auto_play:
-            continue_playing = input("\nPlay a hand? (y/n/auto/plot): ").lower()
+            continue_playing = input("\nPlay a hand? (y/n/auto/train/plot): ").lower()
             if continue_playing == 'n':
                 break
             elif continue_playing == 'y':
@@ -165,45 +359,88 @@ def main():
                     if 10 <= rounds_to_play <= 5000:
                         auto_play = True
                         initial_rounds = rounds_to_play
+                        # Epsilon for each round of the run, plus the value it's left at afterwards.
+                        eps_schedule = game.epsilon * 0.995 ** np.arange(initial_rounds + 1)
+                        run_win_rates = np.empty(initial_rounds, dtype=np.float32)
+                        # Long runs aren't paced, so only report progress instead of narrating every hand.
+                        game.verbose = initial_rounds <= 50
                     else:
                         print("Invalid number of rounds. Please enter a number between 10 and 5000.")
                 except ValueError:
                     print("Invalid input. Please enter a number.")
                 continue
+            elif continue_playing == 'train':
+                rounds_input = input("Enter the number of rounds for training (10-1000000): ")
+                try:
+                    train_rounds = int(rounds_input)
+                except ValueError:
+                    print("Invalid input. Please enter a number.")
+                    continue
+                if not 10 <= train_rounds <= 1000000:
+                    print("Invalid number of rounds. Please enter a number between 10 and 1000000.")
+                    continue
+
+                epsilons = game.epsilon * 0.995 ** np.arange(train_rounds)
+                rewards = simulate_batch(train_rounds, game.Q, game.alpha, game.gamma, epsilons, game.rng)
+                game.epsilon = epsilons[-1] * 0.995
+
+                wins = total_wins + np.cumsum(rewards == 2)
+                losses = total_losses + np.cumsum(rewards < 0)
+                decided = wins + losses
+                win_rates.extend((np.where(decided > 0, wins / np.maximum(decided, 1), 0) * 100).tolist())
+                total_wins = int(wins[-1])
+                total_losses = int(losses[-1])
+                total_ties += int(np.count_nonzero(rewards == 0))
+                round_count += train_rounds
+
+                print(f"\nTrained on {train_rounds} rounds (through Round {round_count}).")
+                print(f"Total Wins: {total_wins}, Total Losses: {total_losses}, Total Ties: {total_ties}")
+                print(f"Win Percentage (excluding ties): {win_rates[-1]:.2f}%")
+                continue
             else:
-                print("Invalid input. Please use 'y', 'n', 'auto', or 'plot'.")
+                print("Invalid input. Please use 'y', 'n', 'auto', 'train', or 'plot'.")
                 continue
         else:
             if rounds_to_play > 0:
                 rounds_to_play -= 1
-                time.sleep(5 / max(initial_rounds, 1))
+                if initial_rounds <= 50:
+                    time.sleep(5 / initial_rounds)
             else:
                 auto_play = False
+                win_rates.extend(run_win_rates.tolist())
+                if not game.verbose:
+                    print(f"\nAuto-played {initial_rounds} rounds (through Round {round_count}).")
+                    print(f"Total Wins: {total_wins}, Total Losses: {total_losses}, Total Ties: {total_ties}")
+                    print(f"Win Percentage (excluding ties): {win_rates[-1]:.2f}%")
+                    game.verbose = True
                 continue
 
         round_count += 1
-        print("\n-----------------------------------")
-        print(f"Round {round_count}:")
         game.deal_initial_cards()
-        print(f"Player's initial hand: {game.player_hand} with a total of {game.score_hand(game.player_hand)}")
-        print(f"Dealer's visible card: {game.dealer_hand[0]}")
+        if game.verbose:
+            print("\n-----------------------------------")
+            print(f"Round {round_count}:")
+            print(f"Player's initial hand: {_hand_label(game.player_hand)} with a total of {game.p_total}")
+            print(f"Dealer's visible card: {_card_label(game.dealer_hand[0])}")
 
-        prev_state = game.compute_state()
         while not game.game_over:
             action = game.ai_decision()
             if action == 0:
                 game.player_hit()
-                print(f"Player hits. Hand: {game.player_hand} with a total of {game.score_hand(game.player_hand)}")
-                if game.score_hand(game.player_hand) > 21:
-                    print("Player busts!")
+                if game.verbose:
+                    print(f"Player hits. Hand: {_hand_label(game.player_hand)} with a total of {game.p_total}")
+                if game.p_total > 21:
+                    if game.verbose:
+                        print("Player busts!")
                     break
             elif action == 1:
                 game.dealer_turn()
-                print("Player stands.")
+                if game.verbose:
+                    print("Player stands.")
 
-        next_state = game.compute_state()
         reward, result_string = game.get_winner()
-        print(result_string)
+        if game.verbose:
+            print(result_string)
 
         if reward == 2:
             total_wins += 1
@@ -217,16 +454,27 @@ def main():
         else:
             win_percentage = 0
 
-        win_rates.append(win_percentage)
+        if auto_play:
+            run_win_rates[initial_rounds - rounds_to_play - 1] = win_percentage
+        else:
+            win_rates.append(win_percentage)
 
-        print(f"\nEnd of Round {round_count} stats:")
-        print(f"Total Wins: {total_wins}, Total Losses: {total_losses}, Total Ties: {total_ties}")
-        print(f"Win Percentage (excluding ties): {win_percentage:.2f}%")
+        if game.verbose:
+            print(f"\nEnd of Round {round_count} stats:")
+            print(f"Total Wins: {total_wins}, Total Losses: {total_losses}, Total Ties: {total_ties}")
+            print(f"Win Percentage (excluding ties): {win_percentage:.2f}%")
+        elif round_count % 100 == 0:
+            print(f"Round {round_count}: Win Percentage (excluding ties): {win_percentage:.2f}%")
 
-        game.update_q_value(prev_state, action, reward, next_state)
+        game.transition(action, reward)
+        if auto_play:
+            game.epsilon = eps_schedule[initial_rounds - rounds_to_play]
+        else:
+            game.epsilon *= 0.995
         game.game_over = False
 
     print("\nGoodbye!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # An optional integer argument seeds the game so a session can be replayed.
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
\ No newline at end of file